@@ -8,11 +8,25 @@ from typing	import Callable
 from . import errors
 from loguru import logger
 import os
-from datetime import datetime
 from string import Template
+from importlib.util import find_spec
 
 CWD = os.path.dirname(os.path.realpath(__file__))
-logger.add(os.path.join(CWD, "error.log"), rotation="1 week", level="DEBUG")
+logger.add(os.path.join(CWD, "error.log"), rotation="1 week", level="DEBUG",
+           backtrace=False, diagnose=False)
+
+USERS_DIR = os.path.join(CWD, 'users')
+USERS_DB_URL = 'sqlite:///' + os.path.join(USERS_DIR, 'UserData.db').replace('\\', '/')
+SQL_ECHO = bool(os.environ.get('PHUB_SQL_ECHO')) # Log every SQL statement
+CSV_ENGINE = 'pyarrow' if find_spec('pyarrow') else 'c' # Stats CSV parser
+SQL_INSERT_PAGE_SIZE = 10000 # Rows per multi-row INSERT statement
+SQL_BATCH_PAGE_SIZE = 500 # Statements per psycopg2 execute_batch call
+SQL_MAX_VARIABLES = 32766 # SQLite bound parameters limit per statement
+SQL_QUERY_CACHE_SIZE = 1200 # Compiled statements kept by the engine
+DB_CACHE_SIZE = 128 # Cached login data reads
+SQL_POOL_SIZE = 10 # Database connections kept open
+SQL_POOL_OVERFLOW = 20 # Extra database connections allowed under load
+SQL_POOL_RECYCLE = 1800 # Maximum database connection age, in seconds
 
 
 HOST = 'https://www.pornhub.com/'
@@ -33,7 +47,17 @@ LOGIN_PAYLOAD = {
 RSS = 'https://www.pornhub.com/video/webmasterss'
 
 MAX_CALL_RETRIES = 4 # Maximum times a HTTPError can be reproduced
-MAX_CALL_TIMEOUT = .4 # Time to wait before retrying basic calls 
+MAX_CALL_TIMEOUT = .4 # Base time to wait before retrying basic calls 
+MAX_CALL_BACKOFF = 30 # Maximum time to wait before retrying basic calls
+
+MAINHUB_TOKEN_TTL = 300 # Time during which a mainhub page token is reused
+
+HTTP_POOL_CONNECTIONS = 16 # Number of host connection pools to cache (site, mainhub, CDNs and alt servers)
+HTTP_POOL_MAXSIZE = 64 # Maximum keep-alive connections per host pool
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024 # Bytes written at once when streaming a download
+RETRY_STATUSES = (408, 425, 429, 500, 502, 503, 504) # Statuses worth retrying a download on another server
+PROBE_TIMEOUT = 2 # Time an alt server has to answer a HEAD probe
+VIDEO_STATS_WORKERS = 16 # Concurrent single video stats requests
 
 DOWNLOAD_SEGMENT_MAX_ATTEMPS = 5
 DOWNLOAD_SEGMENT_ERROR_DELAY = .5
@@ -43,6 +67,8 @@ FFMPEG_COMMAND = FFMPEG_EXECUTABLE + ' -i "{input}" -bsf:a aac_adtstoasc -y -c c
 
 IFRAME = '<iframe src="https://www.pornhub.com/embed/{key}" frameborder="0" width="{width}" height="{height}" scrolling="no" allowfullscreen></iframe>'
 
+CHALLENGE_MARKER = b'RNKEY' # Bytes found in every challenge page
+
 # Supported languages
 LANGUAGES = [ 'cn', 'de', 'fr', 'it', 'pt', 'pl', 'rt', 'nl', 'cz', 'jp' ]
 
@@ -56,7 +82,7 @@ MODELHUB_SETTINGS = "https://www.pornhub.com/model/modelhub/settings"
 THUMBNAIL_UPLOAD = "https://pornhub.mainhub.com/uploading/thumbnail"
 VIDEO_MANAGER_JSON = "https://pornhub.mainhub.com/video-manager/manage-videos-ajax"
 # Use like: CONST.substitute(token=token)
-DAILY_EARNINGS_HISTORY_TEMPLATE = Template(f"https://pornhub.mainhub.com/graph/revenue/history/by-user-earnings-source?start_date=2012-01-01&end_date={datetime.now().strftime('%Y-%m-%d')}&token="+"${token}")
+DAILY_EARNINGS_HISTORY_TEMPLATE = Template("https://pornhub.mainhub.com/graph/revenue/history/by-user-earnings-source?start_date=2012-01-01&end_date=${end_date}&token=${token}")
 TOTAL_PAYOUTS_HISTORY_TEMPLATE = Template("https://pornhub.mainhub.com/earnings/payouts-widget?token=${token}")
 SINGLE_VIDEO_HISTORY_TEMPLATE = Template("https://pornhub.mainhub.com/video-manager/video-stats-ajax?videoId=${video_id}&token=${token}&filter=lifetime")
 DAILY_ACCOUNT_TRAFFIC_TEMPLATE = Template("https://www.pornhub.com/model/daily_traffic?month=${month}") # legacy but still works
@@ -112,11 +138,17 @@ def find(*args) -> WrappedRegex:
 
     def wrapper(string: str, throw: bool = True):
 
-        matches = regex.findall(string)
-        if throw and not matches:
-            _throw_re_error(pattern)
-
-        if len(matches): return matches[0]
+        # Stop at the first match instead of collecting all of them
+        match = regex.search(string)
+        
+        if match is None:
+            if throw: _throw_re_error(pattern)
+            return
+        
+        # Mimic findall output
+        if regex.groups == 0: return match.group()
+        groups = match.groups('')
+        return groups[0] if regex.groups == 1 else groups
 
     wrapper.__doc__ = pattern
     
@@ -211,6 +243,7 @@ class re:
     get_token     = find( r'token *?= \"(.*?)\",'                                                       ) # Get authentification token
     token_mainhub = find(r'token":"([^"]*)'                                                             ) # Get mainhub token
     get_viewkey = mtch(r'[&\?]viewkey=([a-z\d]+)(?=&|$)')  # Get video URL viewkey
+    get_key     = mtch(r'key=([^&#]+)')                    # Get a viewkey from a partial URL
     video_channel = find( r'href=\"(.*?)\" data-event=\"Video Underplayer\".*?bolded\">(.*?)<'          ) # Get video author, if channel
     video_model   = find( r'n class=\"usernameBadgesWrapper.*? href=\"(.*?)\"  class=\"bolded\">(.*?)<' ) # Get video author, if model
     get_feed_type = find( r'data-table="(.*?)"'                                                         ) # Get feed section type
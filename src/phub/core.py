@@ -4,8 +4,11 @@ PHUB core module.
 import os
 import time
 import pyotp
+import threading
+import urllib3
 import requests
-from functools import cached_property
+import requests.adapters
+from functools import lru_cache
 from typing import Literal
 
 from . import utils
@@ -20,6 +23,48 @@ from .modules import parser
 from .objects import (Param, NO_PARAM, Video, User,
                       Account, Query, queries, Playlist)
 
+# Sentinel for lazy attributes that were not loaded yet
+_UNSET = object()
+
+# Database operations are shared between clients using the same database
+_DB_LOCK = threading.Lock()
+_DB_OPS_CACHE: dict[str, DatabaseOperations] = {}
+
+def _get_db_ops(db_url: str) -> DatabaseOperations:
+    '''
+    Get the database operations instance bound to a database,
+    creating it if needed.
+    
+    Args:
+        db_url (str): The database URL.
+    
+    Returns:
+        DatabaseOperations: The shared database operations.
+    '''
+    
+    with _DB_LOCK:
+        if db_url not in _DB_OPS_CACHE:
+            os.makedirs(consts.USERS_DIR, exist_ok = True)
+            _DB_OPS_CACHE[db_url] = DatabaseOperations(db_url)
+        
+        return _DB_OPS_CACHE[db_url]
+
+@lru_cache(maxsize = 512)
+def _resolve_url(func: str) -> str:
+    '''
+    Get the full URL of a PH function.
+    
+    Args:
+        func (str): URL or PH function.
+    
+    Returns:
+        str: The full URL.
+    '''
+    
+    if func.startswith(('http://', 'https://')):
+        return func
+    
+    return consts.HOST + func.strip().lstrip('/')
 
 
 class Client:
@@ -27,6 +72,12 @@ class Client:
     Represents a client capable of handling requests
     with Pornhub.
     '''
+    
+    __slots__ = ('session', 'proxies', '_language', 'credentials', 'delay',
+                 'usertype', 'logged', '_account', 'db_ops',
+                 '_throttle_lock', '_next_call', '_extra_delay', '_token',
+                 '_token_controller', '__weakref__')
+    
     @logger.catch
     def __init__(self,
                  username: str = None,
@@ -56,33 +107,30 @@ class Client:
             login   (bool): Whether to automatically log in after initialization.
         '''
         
-        logger.debug(f'Initialised new Client {self}')
+        logger.opt(lazy = True).debug('Initialised new Client {}', lambda: self)
+        
+        self.proxies = proxies
+        self.session = None
+        self._account = _UNSET
+        self._throttle_lock = threading.Lock()
+        self.language = {'Accept-Language': language}
         
         # Initialise session
         self.reset()
         
-        self.proxies = proxies
-        self.language = {'Accept-Language': language}
         self.credentials = {
             'username': username,
             'password': password,
         } 
         self.delay = delay
-        self.start_delay = False
         self.usertype = usertype
         
-        # Connect account
+        # Account is connected on first access
         self.logged = False
-        self.account = Account(self)
-        logger.debug(f'Connected account to client {self.account}')
         
         # Database operations istantiation, if no db exists it will be created
         if username and password:
-            users_dir = os.path.join(consts.CWD, 'users')
-            os.makedirs(users_dir, exist_ok=True)
-            db_path = os.path.join(users_dir, f"UserData.db")
-            db_url = 'sqlite:///' + db_path.replace('\\', '/')
-            self.db_ops = DatabaseOperations(str(db_url))
+            self.db_ops = _get_db_ops(consts.USERS_DB_URL)
             self.credentials_to_db(username, password, secret_key)
         
         # Automatic login
@@ -90,6 +138,35 @@ class Client:
             logger.debug('Automatic login triggered')
             self.login()
     
+    @property
+    def account(self) -> Account | None:
+        '''
+        The client account, or None if no credentials were given.
+        '''
+        
+        if self._account is _UNSET:
+            self._account = Account(self)
+            logger.debug(f'Connected account to client {self._account}')
+        
+        return self._account
+    
+    @property
+    def language(self) -> dict:
+        '''
+        The language header sent with every request.
+        '''
+        
+        return self._language
+    
+    @language.setter
+    def language(self, value: dict) -> None:
+        
+        self._language = value
+        
+        # Keep the session headers in sync
+        if self.session is not None:
+            self.session.headers.update(value)
+    
     def reset(self) -> None:
         '''
         Reset the client requests session.
@@ -99,6 +176,25 @@ class Client:
         self.session = requests.Session()
         self._clear_granted_token()
         
+        # Reset calls throttling
+        self._next_call = 0.
+        self._extra_delay = 0.
+        
+        # Mount a pooled adapter so keep-alive connections get reused
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections = consts.HTTP_POOL_CONNECTIONS,
+            pool_maxsize = consts.HTTP_POOL_MAXSIZE,
+            pool_block = False,
+            max_retries = urllib3.Retry(total = 0)
+        )
+        
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
+        # Default headers are merged by the session with every request
+        self.session.headers.update(consts.HEADERS)
+        self.session.headers.update(self.language)
+        
         # Bypass age disclaimer
         self.session.cookies.set('accessAgeDisclaimerPH', '1')
         self.session.cookies.set('accessAgeDisclaimerUK', '1')
@@ -109,10 +205,11 @@ class Client:
              func: str,
              method: str = 'GET',
              data: dict = None,
-             headers: dict = {},
+             headers: dict = None,
              timeout: float = 30,
              throw: bool = True,
-             silent: bool = False) -> requests.Response:
+             silent: bool = False,
+             stream: bool = False) -> requests.Response:
         '''
         Send a request.
         
@@ -124,6 +221,7 @@ class Client:
             timeout (float): Request maximum response time.
             throw    (bool): Whether to raise an error when a request explicitly fails.
             silent   (bool): Make the call logging one level deeper.
+            stream   (bool): Leave the body unread, for the caller to iterate.
         
         Returns:
             requests.Response: The fetched response.
@@ -131,13 +229,9 @@ class Client:
         
         logger.log("DEBUG" if silent else "WARNING", f'Making call to {func or "/"}')
         
-        # Delay
-        if self.start_delay:
-            time.sleep(self.delay)
-        else:
-            self.start_delay = True
-
-        url = func if 'http' in func else utils.concat(consts.HOST, func)
+        self._throttle()
+        url = _resolve_url(func)
+        last_err = None
         
         for i in range(consts.MAX_CALL_RETRIES):
             
@@ -146,35 +240,93 @@ class Client:
                 response = self.session.request(
                     method = method,
                     url = url,
-                    headers = consts.HEADERS | headers | self.language,
+                    headers = headers or None,
                     data = data,
                     timeout = timeout,
-                    proxies = self.proxies
+                    proxies = self.proxies,
+                    stream = stream
                 )
                 
-                # Silent 429 errors
-                if b'429</title>' in response.content:
-                    raise ConnectionError('Pornhub raised error 429: too many requests')
+                status = response.status_code
+                
+                # Retry server errors. Once retries are exhausted, hand the
+                # last one to callers that check the status themselves
+                if status >= 500:
+                    if not throw and i == consts.MAX_CALL_RETRIES - 1:
+                        return response
+                    
+                    response.close()
+                    raise ConnectionError(f'Pornhub raised error {status}')
+                
+                # Let the caller handle other client errors. Unless the body
+                # was streamed on request it is already read, so the
+                # connection is back in the pool
+                if 400 <= status != 429:
+                    if throw:
+                        response.close()
+                        response.raise_for_status()
+                    
+                    return response
+                
+                # Silent 429 errors. Some are served as a 200
+                # page, whose title is in the first bytes
+                if (status == 429
+                    or not stream and response.content.find(b'429</title>', 0, 4096) >= 0):
+                    response.close()
+                    self._slow_down()
+                    raise errors.RateLimited('Pornhub raised error 429: too many requests',
+                                             retry_after = response.headers.get('Retry-After'))
                 
-                # Attempt to resolve the challenge if needed
-                if challenge := consts.re.get_challenge(response.text, False):
+                # Attempt to resolve the challenge if needed. Only decode
+                # the page if it contains the challenge cookie name
+                if (not stream
+                    and consts.CHALLENGE_MARKER in response.content
+                    and (challenge := consts.re.get_challenge(response.text, False))):
                     logger.info('\n\nChallenge found, attempting to resolve\n\n')
                     parser.challenge(self, *challenge)
                     continue # Reload page
                 
-                break
+                # Recover speed after successful calls
+                self._extra_delay = max(0., self._extra_delay - consts.MAX_CALL_TIMEOUT)
+                return response
+            
+            except requests.HTTPError:
+                raise
             
             except Exception as err:
+                last_err = err
                 logger.log("DEBUG" if silent else "WARNING",
                            f'Call failed: {repr(err)}. Retrying (attempt {i + 1}/{consts.MAX_CALL_RETRIES})')
-                time.sleep(consts.MAX_CALL_TIMEOUT)
-                continue
+                time.sleep(utils.backoff(i, getattr(err, 'retry_after', None)))
         
-        else:
-            raise ConnectionError(f'Call failed after {i + 1} retries. Aborting.')
-
-        if throw: response.raise_for_status()
-        return response
+        raise ConnectionError(f'Call failed after {consts.MAX_CALL_RETRIES} retries: {last_err!r}') from last_err
+    
+    def _throttle(self) -> None:
+        '''
+        Wait until the next call is allowed. Calls are
+        spaced by the client delay, or by the extra delay
+        that grows when Pornhub rate limits us if it is longer.
+        '''
+        
+        # Book a call slot, then wait for it outside the lock
+        with self._throttle_lock:
+            now = time.monotonic()
+            wait = self._next_call - now
+            interval = max(self.delay, self._extra_delay)
+            self._next_call = max(now, self._next_call) + interval
+        
+        if wait > 0:
+            time.sleep(wait)
+    
+    def _slow_down(self) -> None:
+        '''
+        Double the extra delay between calls after a 429 error.
+        '''
+        
+        self._extra_delay = min(max(self._extra_delay * 2, consts.MAX_CALL_TIMEOUT),
+                                consts.MAX_CALL_BACKOFF)
+        
+        logger.debug(f'Rate limited, spacing calls by {self._extra_delay}s')
     
     def login_cookies(self):
         """
@@ -192,14 +344,17 @@ class Client:
         data_is_logged = is_logged.json()
         logger.debug(f'Login cookies response: {data_is_logged}')
         
-        if int(data_is_logged.get('success')) == 1:
-            self.logged = True
-            # Update account data
-            self.account.connect(data_is_logged)
-        else:
+        if int(data_is_logged.get('success') or 0) != 1:
+            # Drop the stale cookies
             self.reset()
+            self.logged = False
+            return False
         
-        return self.logged
+        self.logged = True
+        
+        # Update account data
+        self.account.connect(data_is_logged)
+        return True
             
     
     def login(self,
@@ -242,8 +397,9 @@ class Client:
         
         # Parse response
         data = response.json()
-        success = int(data.get('success'))
+        success = int(data.get('success') or 0)
         message = data.get('message')
+        data_2fa = None
         
         if success == 1:
             logger.info('Successfully logged in')
@@ -270,7 +426,7 @@ class Client:
 
             # Parse 2FA response
             data_2fa = response_2fa.json()
-            if int(data_2fa.get('success')) == 1:
+            if int(data_2fa.get('success') or 0) == 1:
                 logger.info('Successfully logged in with 2FA')
                 self.db_ops.save_cookies(self.credentials['username'], self.session.cookies)
                 self.logged = True
@@ -310,19 +466,13 @@ class Client:
             # or use another client
             url = video.url
         
-        elif 'http' in video:
+        elif video.startswith(('http://', 'https://')):
             # Support full URLs
             url = video
         
         else:
-            if 'key=' in video:
-                # Support partial URLs
-                key = video.split('key=')[1]
-            
-            else:
-                # Support key only
-                key = str(video)
-            
+            # Support partial URLs and key only
+            key = consts.re.get_key(video, False) or str(video)
             url = utils.concat(consts.HOST, 'view_video.php?viewkey=' + key)
         
         return Video(self, url)
@@ -447,21 +597,19 @@ class Client:
             str: The generated OTP.
         """
         
-        # Retrieve the remaining time until the next TOTP interval
-        remaining_time = self.time_remaining_till_next_interval(timestep)
-
-        # Wait until the next interval if necessary
-        if remaining_time <= wait_threshold:
-            time.sleep(remaining_time + 1)
-            
-        
         # Retrieve the secret key from the database
         secret_key = self.db_ops.get_secret_key(username)
         if secret_key is None:
             raise ValueError("No secret key found for user")
 
-        # Generate the OTP using the secret key
         totp = pyotp.TOTP(secret_key, interval=timestep)
+        
+        # If the current interval is about to end, generate the
+        # code of the next one instead of waiting for it
+        remaining_time = self.time_remaining_till_next_interval(timestep)
+        if remaining_time <= wait_threshold:
+            return totp.at(int(time.time()) + remaining_time + 1)
+        
         return totp.now()
     
     def credentials_to_db(self, username: str, password: str, secret_key: str) -> None:
@@ -479,13 +627,13 @@ class Client:
             return
 
         try:
-            # Save the credentials using the DatabaseOperations instance
-            self.db_ops.save_credentials(username, password)
+            # Save the credentials and secret key in a single transaction
+            with self.db_ops.session_scope() as session:
+                self.db_ops.save_credentials(username, password, session=session)
+                if secret_key:
+                    self.db_ops.insert_secret_key(username, secret_key, session=session)
+            
             logger.info(f"Credentials for user '{username}' have been added/updated successfully.")
-            if secret_key:
-                # Save the secret key using the DatabaseOperations instance
-                self.db_ops.insert_secret_key(username, secret_key)
-                logger.info(f"Secret key for user '{username}' has been added/updated successfully.")
         except Exception as e:
             logger.error(f"Failed to add/update credentials and secret key for user '{username}'. Error: {e}")
 
@@ -495,21 +643,23 @@ class Client:
         Clear the granted token cache.
         '''
         
-        if '_granted_token' in self.__dict__:
-            del self._granted_token
+        self._token = _UNSET
 
-    @cached_property
+    @property
     def _granted_token(self) -> str:
         '''
         Get a granted token after having
         authentified the account.
         '''
         
-        assert self.logged, 'Client must be logged in'
-        self._token_controller = True
+        if self._token is _UNSET:
+            assert self.logged, 'Client must be logged in'
+            self._token_controller = True
 
-        page = self.call('').text
-        return consts.re.get_token(page)
+            page = self.call('').text
+            self._token = consts.re.get_token(page)
+        
+        return self._token
     
     
 
@@ -1,25 +1,70 @@
+import io
+import gc
+import csv
+import threading
+import functools
+from collections import OrderedDict
 import pickle
+import msgspec
+from requests.cookies import RequestsCookieJar, cookiejar_from_dict, create_cookie
+from . import consts
 from .consts import logger
-import pickle
 
-from sqlalchemy import UniqueConstraint, create_engine, Column, String, LargeBinary, Integer, DateTime, JSON, BigInteger, Float, Index
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, Column, String, LargeBinary, Integer, DateTime, BigInteger, Float, Index
+from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import StaticPool
 from sqlalchemy import Table, MetaData
-from sqlalchemy import func
-from sqlalchemy.sql import text
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import func, insert, delete, select, bindparam, event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy.dialects import postgresql, sqlite
 import json
 
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from typing import Union
 import pandas as pd
-from typing import Type, List, Dict
+from typing import List, Dict
 import calendar
 
 
 Base = declarative_base()
 
+# Reusable msgpack codecs
+MSGPACK_ENCODER = msgspec.msgpack.Encoder()
+MSGPACK_DECODER = msgspec.msgpack.Decoder()
+COOKIES_DECODER = msgspec.msgpack.Decoder(list[dict])
+
+
+class MsgPack(TypeDecorator):
+    """
+    Binary column storing msgpack encoded data.
+    Values stored as JSON by older versions are still readable: as text
+    on SQLite, and as UTF-8 bytes once a PostgreSQL JSON column has been
+    migrated to bytea (see DatabaseOperations.migrate_json_columns).
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is not None:
+            return MSGPACK_ENCODER.encode(value)
+
+    def result_processor(self, dialect, coltype):
+        # Bypass the binary processor so legacy JSON strings get through
+        return lambda value: self.process_result_value(value, dialect)
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, (dict, list)):
+            return value
+        if isinstance(value, str):
+            return json.loads(value)
+        
+        # Snapshots are maps, which never start like a JSON document in msgpack
+        if bytes(value[:1]) in (b'{', b'['):
+            return json.loads(bytes(value))
+        return MSGPACK_DECODER.decode(value)
+
 
 # Define models
 # Not really secret, encryption is needed here
@@ -45,13 +90,13 @@ class VideoManager(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)  
     username = Column(String, nullable=False) 
     timestamp = Column(DateTime, default=datetime.now)
-    data = Column(JSON)
+    data = Column(MsgPack)
      
 class VideoDataDaily(Base):
     __tablename__ = 'video_data'
     id = Column(Integer, primary_key=True, autoincrement=True)
-    timestamp = Column(DateTime, index=True)
-    date: int = Column(BigInteger, nullable=False, index=True)
+    timestamp = Column(DateTime)
+    date: int = Column(BigInteger, nullable=False)
     views: int = Column(Integer)
     url: str = Column(String)
     title: str = Column(String)
@@ -61,8 +106,10 @@ class VideoDataDaily(Base):
     username: str = Column(String(255))
 
     # Create indexes for performance
+    # Dates are only ever queried for a given username
     __table_args__ = (
-        Index('ix_video_data_date', 'date'),
+        Index('ix_video_data_username_date', 'username', 'date',
+              postgresql_include=['views', 'earnings']),
         Index('ix_video_data_timestamp', 'timestamp'),
         Index('ix_video_data_url', 'url'),
     )
@@ -88,49 +135,344 @@ class PaymentInfo(Base):
 
 
 
+# Indexes created by older versions and no longer used
+OBSOLETE_INDEXES = ('ix_video_data_date',)
+
+# Dialects supporting INSERT ... ON CONFLICT
+UPSERT_INSERTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+}
+
+# Cookies serialization
+COOKIES_FORMAT_VERSION = b'\x01'
+COOKIE_FIELDS = ('name', 'value', 'domain', 'path', 'secure', 'expires')
+
+def encode_cookies(cookies: Union[RequestsCookieJar, dict]) -> bytes:
+    """
+    Serialize cookies to a versioned msgpack payload.
+
+    Args:
+        cookies (Union[RequestsCookieJar, dict]): Cookie jar or name/value mapping.
+
+    Returns:
+        bytes: The serialized cookies.
+    """
+    if not isinstance(cookies, RequestsCookieJar):
+        cookies = cookiejar_from_dict(dict(cookies))
+    
+    entries = [{field: getattr(cookie, field) for field in COOKIE_FIELDS} for cookie in cookies]
+    return COOKIES_FORMAT_VERSION + MSGPACK_ENCODER.encode(entries)
+
+def decode_cookies(raw: bytes) -> RequestsCookieJar:
+    """
+    Deserialize cookies written by encode_cookies.
+
+    Args:
+        raw (bytes): The serialized cookies.
+
+    Returns:
+        RequestsCookieJar: The cookies.
+    """
+    jar = RequestsCookieJar()
+    for entry in COOKIES_DECODER.decode(memoryview(raw)[len(COOKIES_FORMAT_VERSION):]):
+        jar.set_cookie(create_cookie(**entry))
+    
+    return jar
+
+def copy_rows(table, conn, keys: list, data_iter) -> None:
+    """
+    Insert rows using PostgreSQL COPY. Used as a pandas
+    DataFrame.to_sql method with the psycopg2 driver.
+
+    Args:
+        table (SQLTable): The pandas table wrapper.
+        conn (Connection): The SQLAlchemy connection.
+        keys (list): The column names.
+        data_iter (Iterable): The rows to insert.
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(data_iter)
+    buffer.seek(0)
+
+    quote = conn.dialect.identifier_preparer.quote
+    columns = ', '.join(quote(key) for key in keys)
+    statement = f"COPY {quote(table.name)} ({columns}) FROM STDIN WITH (FORMAT csv)"
+
+    with conn.connection.cursor() as cursor:
+        cursor.copy_expert(statement, buffer)
+
+def cached_read(model):
+    """
+    Cache the result of a read operation by username, until a
+    write on the same model invalidates it.
+
+    Args:
+        model (Base): The mapped class the operation reads from.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, username: str, session=None):
+            key = (model.__tablename__, username)
+            with self._cache_lock:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    return self._cache[key]
+                generation = self._cache_generation
+
+            value = method(self, username, session)
+
+            with self._cache_lock:
+                # Do not cache a row read before a concurrent commit
+                if generation == self._cache_generation:
+                    self._cache[key] = value
+                    if len(self._cache) > consts.DB_CACHE_SIZE:
+                        self._cache.popitem(last=False)
+            return value
+        return wrapper
+    return decorator
+
+def catch_standalone(level: str = "ERROR"):
+    """
+    Log and swallow the errors of a write running in its own transaction.
+    When the caller passes a session, errors propagate so that the
+    enclosing transaction rolls back as a whole.
+
+    Args:
+        level (str): The level to log caught errors at.
+    """
+    def decorator(method):
+        caught = logger.catch(level=level)(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, session=None, **kwargs):
+            if session is not None:
+                return method(self, *args, session=session, **kwargs)
+            return caught(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+@contextmanager
+def paused_gc():
+    """
+    Disable the garbage collector while building and inserting
+    large batches of short lived dicts.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+def parse_ymd(date: str) -> datetime:
+    """
+    Parse a YYYY-MM-DD date without going through strptime.
+
+    Args:
+        date (str): The date string.
+
+    Returns:
+        datetime: The parsed date.
+    """
+    return datetime(int(date[0:4]), int(date[5:7]), int(date[8:10]))
+
+
 class DatabaseOperations:
     
-    @logger.catch(level="DEBUG")
     def __init__(self, db_path: str):
-        self.engine = create_engine(db_path, echo=True)
+        url = make_url(db_path)
+        options = {}
+        
+        if url.get_driver_name() == 'psycopg2':
+            # Use psycopg2 fast execution helpers for executemany
+            options |= dict(executemany_mode='values_plus_batch',
+                            executemany_batch_page_size=consts.SQL_BATCH_PAGE_SIZE)
+        
+        if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+            # Share the single in-memory connection between threads
+            options |= dict(poolclass=StaticPool,
+                            connect_args={'check_same_thread': False})
+        
+        elif url.database not in (None, '', ':memory:'):
+            # Hand back the most recently used connection first
+            options |= dict(pool_use_lifo=True,
+                            pool_size=consts.SQL_POOL_SIZE,
+                            max_overflow=consts.SQL_POOL_OVERFLOW,
+                            pool_recycle=consts.SQL_POOL_RECYCLE)
+        
+        self.engine = create_engine(db_path, echo=consts.SQL_ECHO, pool_pre_ping=True,
+                                    insertmanyvalues_page_size=consts.SQL_INSERT_PAGE_SIZE,
+                                    query_cache_size=consts.SQL_QUERY_CACHE_SIZE,
+                                    **options)
         Base.metadata.create_all(self.engine)
-        self.Session = sessionmaker(bind=self.engine)
+        self.migrate_json_columns()
+        
+        # Add indexes introduced after the tables were created
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(self.engine, checkfirst=True)
+        
+        # Drop indexes superseded since, like the date index
+        # now covered by (username, date)
+        with self.engine.begin() as conn:
+            for name in OBSOLETE_INDEXES:
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        
+        # Keep loaded attributes after commit to avoid refetching them
+        self.Session = sessionmaker(bind=self.engine, expire_on_commit=False)
+        
+        # LRU cache of login data reads, keyed by (table, username)
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_generation = 0
+        
+        # Drop cached reads only once their writes are committed
+        event.listen(self.Session, 'after_commit', self._after_commit)
+        event.listen(self.Session, 'after_rollback', lambda session: session.info.pop('invalidate', None))
+        
+        # Build the hot statements once so their compiled
+        # form is reused from the statement cache
+        self._video_insert = insert(VideoDataDaily)
+        self._earnings_insert = insert(TotalEarningsDaily)
+        self._payment_insert = insert(PaymentInfo)
+        self._monitor_select = (select(VideoManager.data)
+                                .where(VideoManager.username == bindparam('username'))
+                                .order_by(VideoManager.timestamp.desc())
+                                .limit(2))
+        
+        
+    def migrate_json_columns(self):
+        """
+        Convert the PostgreSQL JSON snapshot column of older versions to
+        bytea, keeping the existing rows as UTF-8 JSON. SQLite columns
+        have no strict type and need no migration.
+        """
+        if self.engine.dialect.name != 'postgresql':
+            return
+        
+        columns = {column['name']: column['type'] for column in inspect(self.engine).get_columns(VideoManager.__tablename__)}
+        if isinstance(columns['data'], LargeBinary):
+            return
+        
+        with self.engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {VideoManager.__tablename__} ALTER COLUMN data "
+                              "TYPE bytea USING convert_to(data::text, 'UTF8')"))
+        logger.info("Migrated the video manager snapshots column to bytea")
+        
         
+    @contextmanager
+    def session_scope(self, session=None):
+        """
+        Provide a transactional scope around a series of operations.
+
+        Args:
+            session (Session): Optional session of an enclosing scope. It is
+                reused as is and committed by the scope that opened it.
+
+        Yields:
+            Session: The session to use.
+        """
+        if session is not None:
+            yield session
+            return
+        
+        with self.Session() as session:
+            try:
+                yield session
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+            
+            
+    def invalidate(self, session, model, username: str):
+        """
+        Drop the cached reads of a user on a table once the session
+        commits, so concurrent reads cannot cache the previous row.
+
+        Args:
+            session (Session): The session writing the user's row.
+            model (Base): The mapped class of the table.
+            username (str): The user to invalidate.
+        """
+        session.info.setdefault('invalidate', set()).add((model.__tablename__, username))
+            
+            
+    def _after_commit(self, session):
+        """
+        Drop the cached reads written by a committed session.
+
+        Args:
+            session (Session): The committed session.
+        """
+        keys = session.info.pop('invalidate', ())
+        if not keys:
+            return
         
+        with self._cache_lock:
+            self._cache_generation += 1
+            for key in keys:
+                self._cache.pop(key, None)
+            
+            
+    def upsert(self, session, model, values: dict):
+        """
+        Insert a row, or update it if its primary key already exists,
+        in a single statement when the dialect supports it.
+
+        Args:
+            session (Session): The session to run in.
+            model (Base): The mapped class of the table.
+            values (dict): Column values, including the primary key.
+        """
+        dialect_insert = UPSERT_INSERTS.get(self.engine.dialect.name)
+        if dialect_insert is None:
+            session.merge(model(**values))
+            return
+        
+        # Update from the EXCLUDED row so values are only bound once
+        keys = [column.name for column in model.__table__.primary_key]
+        statement = dialect_insert(model).values(**values)
+        statement = statement.on_conflict_do_update(
+            index_elements=keys,
+            set_={key: statement.excluded[key] for key in values if key not in keys}
+        )
+        session.execute(statement)
+            
+            
     
     # LOGIN OPERATIONS
-    @logger.catch(level="DEBUG")
-    def save_credentials(self, username: str, password: str):
+    @catch_standalone("DEBUG")
+    def save_credentials(self, username: str, password: str, session=None):
         """
         Save credentials for a user.
 
         Args:
             username (str):
             password (str): 
+            session (Session): Optional session to run in.
         """
-        with self.Session() as session:
-            credential = session.query(Credential).filter_by(username=username).first()
-            if credential:
-                credential.password = password
-            else:
-                credential = Credential(username=username, password=password)
-                session.add(credential)
-            session.commit()
+        with self.session_scope(session) as session:
+            self.upsert(session, Credential, {'username': username, 'password': password})
+            self.invalidate(session, Credential, username)
             
             
-    @logger.catch(level="DEBUG")
-    def load_credentials(self, username: str) -> Union[tuple, None]:
+    @cached_read(Credential)
+    def load_credentials(self, username: str, session=None) -> Union[tuple, None]:
         """
         Load credentials for a user.
 
         Args:
             username (str): 
+            session (Session): Optional session to run in.
 
         Returns:
             Union[tuple, None]: 
         """
-        with self.Session() as session:
-            credential = session.query(Credential).filter_by(username=username).first()
+        with self.session_scope(session) as session:
+            credential = session.get(Credential, username)
             
             if credential:
                 logger.info(f"Credentials loaded for user: {username}")
@@ -140,44 +482,47 @@ class DatabaseOperations:
                 return None
             
             
-    @logger.catch(level="DEBUG")
-    def save_cookies(self, username: str, cookies: dict):
+    @catch_standalone("DEBUG")
+    def save_cookies(self, username: str, cookies: dict, session=None):
         """
         Save cookies for a user.
 
         Args:
             username (str): 
             cookies (dict): 
+            session (Session): Optional session to run in.
         """
-        with self.Session() as session:
-            pickled_cookies = pickle.dumps(cookies)
-            session_data = session.query(SessionData).filter_by(username=username).first()
-            if session_data:
-                session_data.session = pickled_cookies
-            else:
-                session_data = SessionData(username=username, session=pickled_cookies)
-                session.add(session_data)
-            session.commit()
+        with self.session_scope(session) as session:
+            self.upsert(session, SessionData, {'username': username, 'session': encode_cookies(cookies)})
             
             logger.info(f"Cookies saved for user: {username}")
+            self.invalidate(session, SessionData, username)
             
             
-    @logger.catch(level="DEBUG")
-    def load_cookies(self, username: str) -> Union[dict, None]:
+    @cached_read(SessionData)
+    def load_cookies(self, username: str, session=None) -> Union[dict, None]:
         """
         Load cookies for a user.
 
         Args:
             username (str): 
+            session (Session): Optional session to run in.
 
         Returns:
             Union[dict, None]: 
         """
-        with self.Session() as session:
-            session_data = session.query(SessionData).filter_by(username=username).first()
+        with self.session_scope(session) as session:
+            session_data = session.get(SessionData, username)
             
             if session_data:
-                cookies = pickle.loads(session_data.session)
+                if session_data.session.startswith(COOKIES_FORMAT_VERSION):
+                    cookies = decode_cookies(session_data.session)
+                else:
+                    # Migrate cookies saved by older versions
+                    cookies = pickle.loads(session_data.session)
+                    self.upsert(session, SessionData, {'username': username, 'session': encode_cookies(cookies)})
+                    logger.info(f"Cookies migrated for user: {username}")
+                
                 logger.info(f"Cookies loaded for user: {username}")
                 return cookies
             else:
@@ -185,40 +530,37 @@ class DatabaseOperations:
                 return None
             
             
-    @logger.catch(level="DEBUG")
-    def insert_secret_key(self, username: str, secret_key: str):
+    @catch_standalone("DEBUG")
+    def insert_secret_key(self, username: str, secret_key: str, session=None):
         """
         Insert secret key for a user.
 
         Args:
             username (str):
             secret_key (str): 
+            session (Session): Optional session to run in.
         """
-        with self.Session() as session:
-            secret_key_entry = session.query(SecretKey).filter_by(username=username).first()
-            if secret_key_entry:
-                secret_key_entry.secret_key = secret_key
-            else:
-                secret_key_entry = SecretKey(username=username, secret_key=secret_key)
-                session.add(secret_key_entry)
-            session.commit()
+        with self.session_scope(session) as session:
+            self.upsert(session, SecretKey, {'username': username, 'secret_key': secret_key})
             
             logger.info(f"Secret key inserted for user: {username}")
+            self.invalidate(session, SecretKey, username)
             
             
-    @logger.catch(level="DEBUG")
-    def get_secret_key(self, username: str) -> str:
+    @cached_read(SecretKey)
+    def get_secret_key(self, username: str, session=None) -> str:
         """
         Get secret key for a user.
 
         Args:
             username (str): 
+            session (Session): Optional session to run in.
 
         Returns:
             str: secret key
         """
-        with self.Session() as session:
-            secret_key_entry = session.query(SecretKey).filter_by(username=username).first()
+        with self.session_scope(session) as session:
+            secret_key_entry = session.get(SecretKey, username)
             if secret_key_entry:
                 logger.info(f"Secret key loaded for user: {username}")
                 #logger.debug(f"Secret key: {secret_key_entry.secret_key}")
@@ -228,30 +570,35 @@ class DatabaseOperations:
                 return None
             
             
-    @logger.catch(level="DEBUG")
-    def del_session(self, username: str):
+    @catch_standalone("DEBUG")
+    def del_session(self, username: str, session=None):
         """
         Delete session for a user.
 
         Args:
             username (str): Username
+            session (Session): Optional session to run in.
+        
+        Returns:
+            bool: Whether a session was deleted.
         """
-        with self.Session() as session:
-            session_data = session.query(SessionData).filter_by(username=username).delete()
-            session.commit()
+        with self.session_scope(session) as session:
+            deleted = session.execute(delete(SessionData).where(SessionData.username == username)).rowcount > 0
             
-            if session_data:
+            if deleted:
                 logger.info(f"Session deleted for user: {username}")
             else:
-                logger.info(f"No session found for user: {username}")
+                logger.info(f"No session to delete for user: {username}")
+            self.invalidate(session, SessionData, username)
+        return deleted
                 
                 
                 
                 
                 
     # DATA SAVING OPERATIONS
-    @logger.catch(level="DEBUG")
-    def save_video_json_data(self, data: dict, username: str,):
+    @catch_standalone("DEBUG")
+    def save_video_json_data(self, data: dict, username: str, session=None):
         """ 
         Save JSON data of video manager with current timestamp.
         We use this data just for monitoring video states by comparing the data with the previous one.
@@ -259,12 +606,12 @@ class DatabaseOperations:
         Args:
             username (str): The username associated with the JSON data.
             data (dict): JSON data to save.
+            session (Session): Optional session to run in.
         """
-        with self.Session() as session:
-            json_data = VideoManager(username=username, data=data)
-            session.add(json_data)
-            session.commit()
-        self.maintain_last_x_timestamps(VideoManager)
+        with self.session_scope(session) as session:
+            # A Core insert skips the unit of work flush for this single row
+            session.execute(insert(VideoManager).values(username=username, data=data))
+            self.maintain_last_x_timestamps(VideoManager, session=session)
         logger.info("video manager data saved with current timestamp")
             
             
@@ -288,104 +635,110 @@ class DatabaseOperations:
         # Create the table in the database if it doesn't exist
         metadata.create_all(self.engine)
 
-        # Convert DataFrame to a list of dictionaries for bulk insert
-        # Add the username to each row dictionary
-        list_to_write = [dict(row, username=username) for row in df.to_dict(orient='records')]
-
-        with self.Session() as session:
-            # Insert data into the table
-            session.execute(csv_table.insert(), list_to_write)
-            session.commit()
+        # Let pandas write the rows. PostgreSQL loads them with COPY,
+        # other databases with multi-row INSERTs within the bound
+        # parameters limit
+        df = df.assign(timestamp=datetime.now(), username=username)
+        if self.engine.dialect.driver == 'psycopg2':
+            method, chunksize = copy_rows, None
+        else:
+            method, chunksize = 'multi', max(1, consts.SQL_MAX_VARIABLES // len(df.columns))
+        
+        df.to_sql(csv_table.name, self.engine, if_exists='append', index=False,
+                  method=method, chunksize=chunksize)
 
         logger.info("CSV data saved to the database with timestamp.")
         
      
-    @logger.catch(level="DEBUG")
-    def save_single_video_data(self, data_list: List[Dict], username: str) -> None:
+    @catch_standalone("DEBUG")
+    def save_single_video_data(self, data_list: List[Dict], username: str, session=None) -> None:
         """
         Writes a list of video data dictionaries to the database.
 
         Args:
             data_list (List[Dict]): List of dictionaries containing video data.
+            session (Session): Optional session to run in.
         """
-        timestamp = datetime.now()
-        video_data_entries = []
-        for data in data_list:
-            video_data_entries.append(
-                VideoDataDaily(
-                    date=int(data.get('timestamp', 0)),
-                    views=data.get('views', 0),
-                    url=data.get('url', ''),
-                    title=data.get('title', ''),
-                    earnings=data.get('sales', 0.0),
-                    site=data.get('site', ''),
-                    type=data.get('type', ''),
-                    username=username,
-                    timestamp=timestamp
-                )
-            )
-
-        with self.Session() as session:
-            session.bulk_save_objects(video_data_entries)
-            session.commit()
-            self.maintain_last_x_timestamps(VideoDataDaily, 1)
+        with self.session_scope(session) as session, paused_gc():
+            timestamp = datetime.now()
+            video_data_entries = [
+                {
+                    'date': int(data.get('timestamp', 0)),
+                    'views': data.get('views', 0),
+                    'url': data.get('url', ''),
+                    'title': data.get('title', ''),
+                    'earnings': data.get('sales', 0.0),
+                    'site': data.get('site', ''),
+                    'type': data.get('type', ''),
+                    'username': username,
+                    'timestamp': timestamp
+                }
+                for data in data_list
+            ]
+
+            # Plain mappings go through batched multi-row INSERTs. An
+            # empty parameter list would insert a single default row
+            if video_data_entries:
+                session.execute(self._video_insert, video_data_entries)
+            self.maintain_last_x_timestamps(VideoDataDaily, 1, session=session)
             logger.info("Video data saved to the database.")
 
                 
-    @logger.catch
-    def save_daily_earnings_data(self, data: dict, username: str) -> None:
+    @catch_standalone()
+    def save_daily_earnings_data(self, data: dict, username: str, session=None) -> None:
         """
         Save the daily earnings timeseries
 
         Args:
             data (dict): The metrics data in JSON format.
             username (str): The username associated with the metrics data.
+            session (Session): Optional session to run in.
         """
-        metrics_data_entries = []
-        for date, values in data['data'].items():
-            for site, site_data in values.items():
-                for metric_type, metric_data in site_data.items():
-                    amount = metric_data['amount']
-                    metrics_data_entries.append(
-                        TotalEarningsDaily(
-                            timestamp=datetime.strptime(date, '%Y-%m-%d'),
-                            earnings_type=metric_type,
-                            value=amount,
-                            username=username
-                        )
-                    )
-
-        with self.Session() as session:
-            session.bulk_save_objects(metrics_data_entries)
-            session.commit()
+        with self.session_scope(session) as session, paused_gc():
+            metrics_data_entries = []
+            for date, values in data['data'].items():
+                timestamp = parse_ymd(date)
+                for site, site_data in values.items():
+                    for metric_type, metric_data in site_data.items():
+                        metrics_data_entries.append({
+                            'timestamp': timestamp,
+                            'earnings_type': metric_type,
+                            'value': metric_data['amount'],
+                            'username': username
+                        })
+
+            # An empty parameter list would insert a single default row
+            if metrics_data_entries:
+                session.execute(self._earnings_insert, metrics_data_entries)
             logger.info("Metrics data saved to the database.")
 
         
-    @logger.catch(level="DEBUG")
-    def save_payout_data(self, data: dict, username: str) -> None:
+    @catch_standalone("DEBUG")
+    def save_payout_data(self, data: dict, username: str, session=None) -> None:
         """
         Writes payment information to the database.
 
         Args:
             data (dict): Dictionary containing payment information.
             username (str): Username associated with the payment information.
+            session (Session): Optional session to run in.
         """
-        payment_info_list = data['data']['paymentInfo']
-
-        with self.Session() as session:
-            for payment_info in payment_info_list:
+        payment_entries = [
+            {
+                'username': username,
                 # Convert the date to DDMMYYYY format
-                finalized_on = datetime.strptime(payment_info['finalized_on'], '%B %d, %Y').strftime('%d%m%Y')
-
-                payment_entry = PaymentInfo(
-                    username=username,
-                    finalized_on=finalized_on,
-                    net_amount=payment_info['net_amount'],
-                    payment_status=payment_info['payment_status'],
-                    invoice_link=payment_info.get('invoice_link', ''),
-                )
-                session.add(payment_entry)
-            session.commit()
+                'finalized_on': datetime.strptime(payment_info['finalized_on'], '%B %d, %Y').strftime('%d%m%Y'),
+                'net_amount': payment_info['net_amount'],
+                'payment_status': payment_info['payment_status'],
+                'invoice_link': payment_info.get('invoice_link', ''),
+            }
+            for payment_info in data['data']['paymentInfo']
+        ]
+
+        with self.session_scope(session) as session:
+            # An empty parameter list would insert a single default row
+            if payment_entries:
+                session.execute(self._payment_insert, payment_entries)
         logger.info("Payment information saved to the database.")
         
         
@@ -393,7 +746,6 @@ class DatabaseOperations:
         
         
     # DATA RETRIEVAL OPERATIONS
-    @logger.catch(level="DEBUG")
     def get_conversion_rate_for_payout(self, year: int, month: int, username: str) -> float:
         """
         Calculate the earnings per 1 million views for a specific payout year and month, and username.
@@ -410,20 +762,18 @@ class DatabaseOperations:
         # Calculate the start and end dates of the given month
         start_date = datetime(year, month, 1)
         end_date = start_date + timedelta(days=calendar.monthrange(year, month)[1])
+        start_ts, end_ts = start_date.timestamp(), end_date.timestamp()
 
-        # Query the database for the video data in the given month
+        # Sum the views and earnings of the given month in one query
         with self.Session() as session:
-            total_views = session.query(func.sum(VideoDataDaily.views)).filter(
+            total_views, total_earnings = session.query(
+                func.coalesce(func.sum(VideoDataDaily.views), 0),
+                func.coalesce(func.sum(VideoDataDaily.earnings), 0.0)
+            ).filter(
                 VideoDataDaily.username == username,
-                VideoDataDaily.date >= start_date.timestamp(),
-                VideoDataDaily.date < end_date.timestamp()
-            ).scalar() or 0
-
-            total_earnings = session.query(func.sum(VideoDataDaily.earnings)).filter(
-                VideoDataDaily.username == username,
-                VideoDataDaily.date >= start_date.timestamp(),
-                VideoDataDaily.date < end_date.timestamp()
-            ).scalar() or 0
+                VideoDataDaily.date >= start_ts,
+                VideoDataDaily.date < end_ts
+            ).one()
 
         # Calculate the earnings per 1 million views
         if total_views > 0:
@@ -433,7 +783,6 @@ class DatabaseOperations:
             return None
     
     
-    @logger.catch(level="DEBUG")
     def get_monitor_data(self, username: str) -> List[str]:
         """
         Fetch the JSON data strings from the two most recent video entries for a given user.
@@ -447,31 +796,29 @@ class DatabaseOperations:
         """
         with self.Session() as session:
             # Query the two most recent video entries for the given username
-            rows = session.query(VideoManager.data).filter(VideoManager.username == username).order_by(VideoManager.timestamp.desc()).limit(2).all()
+            video_data_strings = session.scalars(self._monitor_select, {'username': username}).all()
             
-            if len(rows) < 2:
+            if len(video_data_strings) < 2:
                 logger.error(f"Not enough video data to compare for user {username}")
                 raise Exception("Not enough video data to compare")
             
-            # Extract the JSON data strings from the query result
-            video_data_strings = [row[0] for row in rows]
-            
             return video_data_strings
             
         
     # MAINTENANCE OPERATIONS
-    @logger.catch(level="DEBUG")
-    def maintain_last_x_timestamps(self, table_class, x: int = 10):
+    def maintain_last_x_timestamps(self, table_class, x: int = 10, session=None):
         """ Maintain the last x batches (timestamps) in the given table.
         Args:
             table_class (Base): The class representing the table to maintain the last x batches in.
             x (int): The number of batches to keep.
+            session (Session): Optional session to run in.
         """
-        with self.Session() as session:
-            # Get the last x unique batch_ids
+        with self.session_scope(session) as session:
+            # Get the oldest of the last x unique batch timestamps
             subquery = session.query(table_class.timestamp).distinct().order_by(table_class.timestamp.desc()).limit(x).subquery()
+            cutoff = session.query(func.min(subquery.c.timestamp)).scalar()
             
-            # Delete records not in the last x batches
-            session.query(table_class).filter(~table_class.timestamp.in_(subquery)).delete(synchronize_session=False)
-            session.commit()
+            # Delete older records with an index range scan
+            if cutoff is not None:
+                session.query(table_class).filter(table_class.timestamp < cutoff).delete(synchronize_session=False)
         logger.info(f"Kept only the last {x} batches in {table_class.__tablename__} table")
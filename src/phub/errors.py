@@ -40,6 +40,22 @@ class MaxRetriesExceeded(Exception):
     to slow down requests.
     '''
 
+class RateLimited(ConnectionError):
+    '''
+    Pornhub refused to serve the request because
+    too many were sent (error 429). The client
+    retries those calls with a growing delay.
+    '''
+    
+    def __init__(self, *args, retry_after: str = None) -> None:
+        '''
+        Args:
+            retry_after (str): The server Retry-After header value, if any.
+        '''
+        
+        super().__init__(*args)
+        self.retry_after = retry_after
+
 class UserNotFound(Exception):
     '''
     User wasn't found. This either happens
@@ -140,10 +140,13 @@ def _base_threaded(client: Client, segments: list[str], callback: CallbackType,
     logging.info('Threaded download initiated')
     buffer = {}
     length = len(segments)
-    logger.info('Mounting download adapter')
+    
+    # Keep the client warm connection pool unless it is too small
     old_adapter = client.session.adapters.get('https://')
-    adapter = requests.adapters.HTTPAdapter(pool_maxsize = max_workers)
-    client.session.mount('https://', adapter)
+    if max_workers > consts.HTTP_POOL_MAXSIZE:
+        logger.info('Mounting download adapter')
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize = max_workers)
+        client.session.mount('https://', adapter)
 
     with Pool(max_workers=max_workers) as executor:
         future_to_url = {executor.submit(_thread, client, url, timeout): url for url in segments}
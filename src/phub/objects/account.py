@@ -4,13 +4,14 @@ import io
 import os
 import random
 import time
+import requests
 import pandas as pd
-import json
+import msgspec
 from pprint import pprint
 from functools import cached_property
-from typing import TYPE_CHECKING, Self, Literal, Iterator, Union
+from typing import TYPE_CHECKING, Self, Literal, Union
 import concurrent.futures
-from datetime import datetime, timedelta
+from datetime import datetime
 
 from .. import utils
 from .. import consts
@@ -23,6 +24,9 @@ if TYPE_CHECKING:
 
 from ..consts import logger
 
+# Parse mainhub responses straight from their bytes
+JSON_DECODER = msgspec.json.Decoder()
+
 class Account:
     '''
     Represents a connected Ponhub account,
@@ -63,7 +67,7 @@ class Account:
         
         # Save data keys so far, so we can make a difference with the
         # cached property ones.
-        self.loaded_keys = list(self.__dict__.keys()) + ['loaded_keys']
+        self.loaded_keys = frozenset(self.__dict__) | {'loaded_keys'}
         
         logger.info(f'Account object {self} created')
         
@@ -104,11 +108,11 @@ class Account:
             self.client.login(force = True)
         
         # Clear properties cache
-        for key in list(self.__dict__.keys()):
-            if not key in self.loaded_keys:
-                
-                logger.debug(f'Deleting key {key}')
-                delattr(self, key)
+        cached_keys = self.__dict__.keys() - self.loaded_keys
+        logger.debug(f'Deleting keys {cached_keys}')
+        
+        for key in cached_keys:
+            del self.__dict__[key]
     
     @cached_property
     def recommended(self) -> queries.VideoQuery:
@@ -141,19 +145,23 @@ class Account:
         return queries.VideoQuery(self.client, f'users/{self.name}/videos/favorites')
     
     @cached_property
-    def subscriptions(self) -> Iterator[User]:
+    def subscriptions(self) -> list[User]:
         '''
         Get the account subscriptions.
         '''
         
         page = self.client.call(f'users/{self.name}/subscriptions')
+        host = consts.HOST
         
+        users = []
         for url, avatar in consts.re.get_users(page.text):
             
-            obj = User.get(self.client, utils.concat(consts.HOST, url))
+            obj = User.get(self.client, host + url.lstrip('/'))
             obj._cached_avatar_url = avatar # Inject image url
             
-            yield obj
+            users.append(obj)
+        
+        return users
     
     @cached_property
     def feed(self) -> Feed:
@@ -191,6 +199,48 @@ class Model(Account):
     
     def __init__(self, client: 'Client') -> None:
         self.client = client
+        
+        # Keys set so far, anything added later is cleared on refresh
+        self.loaded_keys = frozenset(self.__dict__) | {'loaded_keys'}
+    
+    @property
+    def _mainhub_token(self) -> str:
+        '''
+        Visit the mainhub and get its page token. The token is reused
+        for consts.MAINHUB_TOKEN_TTL seconds, until the model is refreshed,
+        the client session is reset or a call made with it is refused.
+        '''
+        
+        timestamp, session, token = self.__dict__.get('_mainhub_cache', (0., None, None))
+        
+        if (token is None or session is not self.client.session
+            or time.monotonic() - timestamp > consts.MAINHUB_TOKEN_TTL):
+            page = self.client.call(consts.PORNHUB_GOTO_MAINHUB).text
+            token = consts.re.token_mainhub(page)
+            self._mainhub_cache = (time.monotonic(), self.client.session, token)
+        
+        return token
+    
+    def _mainhub_call(self, url: str, **kwargs) -> requests.Response:
+        '''
+        Call a mainhub endpoint, dropping the cached
+        token if the server refuses it.
+        
+        Args:
+            url (str): The endpoint URL.
+            kwargs: Client.call arguments.
+        
+        Returns:
+            requests.Response: The endpoint response.
+        '''
+        
+        try:
+            return self.client.call(url, **kwargs)
+        
+        except requests.HTTPError as err:
+            if err.response is not None and err.response.status_code in (401, 403):
+                self.__dict__.pop('_mainhub_cache', None)
+            raise
     
     @logger.catch
     def get_stats_csv(self) -> pd.DataFrame | bool:  
@@ -206,7 +256,7 @@ class Model(Account):
      
         self.client.call(consts.PORNHUB_GOTO_MAINHUB, timeout = 10) 
         content = self.client.call(consts.PORNHUB_MAINHUB_EXPORT_URL, timeout = 10).content
-        df = pd.read_csv(io.StringIO(content.decode('utf-8')), sep=',')
+        df = pd.read_csv(io.BytesIO(content), sep=',', engine=consts.CSV_ENGINE)
         
         if not df.empty:
             
@@ -242,7 +292,7 @@ class Model(Account):
         """
         self.client.call(consts.PORNHUB_GOTO_MAINHUB, timeout=10)
         res = self.client.call(consts.VIDEO_MANAGER_JSON, method = 'POST', data = '{"uc": 0, "itemsPerPage": 2000, "useOffset": 0}', timeout = 10)
-        data = json.loads(res.text)
+        data = JSON_DECODER.decode(res.content)
         self.client.db_ops.save_video_json_data(data, self.client.credentials['username'])
         return data
     
@@ -259,8 +309,9 @@ class Model(Account):
             dict: JSON data
         """
         self.client.call(consts.PORNHUB_GOTO_MAINHUB)
-        res = self.client.call(consts.DAILY_EARNINGS_HISTORY_TEMPLATE.substitute(token = self.client._granted_token), timeout = 10)
-        earnings_data = json.loads(res.text)
+        res = self.client.call(consts.DAILY_EARNINGS_HISTORY_TEMPLATE.substitute(end_date = datetime.now().strftime('%Y-%m-%d'),
+                                                                                      token = self.client._granted_token), timeout = 10)
+        earnings_data = JSON_DECODER.decode(res.content)
         self.client.db_ops.save_daily_earnings_data(earnings_data, self.client.credentials['username'])
         return earnings_data
     
@@ -276,12 +327,8 @@ class Model(Account):
         Returns:
             dict: JSON data
         """
-        # Get the mainhub page token
-        page = self.client.call(consts.PORNHUB_GOTO_MAINHUB).text
-        token = consts.re.token_mainhub(page)
-        
-        res = self.client.call(consts.TOTAL_PAYOUTS_HISTORY_TEMPLATE.substitute(token = token), timeout = 10)
-        payout_data = json.loads(res.text)
+        res = self._mainhub_call(consts.TOTAL_PAYOUTS_HISTORY_TEMPLATE.substitute(token = self._mainhub_token), timeout = 10)
+        payout_data = JSON_DECODER.decode(res.content)
         self.client.db_ops.save_payout_data(payout_data, self.client.credentials['username'])
         return payout_data
         
@@ -297,58 +344,58 @@ class Model(Account):
             List: List of dicts 
         """
 
-        def fetch_video_data(row, video_count: int):
+        def fetch_video_data(video_id, title: str, video_url: str, video_count: int):
             """
             Fetch the video data of each pornhub video (earnings and views timeseries).
 
             Args:
-                row (pd.Series): A row of the filtered_ids DataFrame
+                video_id: The video ID
+                title (str): The video title
+                video_url (str): The video site URL
+                video_count (int): The number of videos being fetched
 
             Returns:
-                list: List of dictionaries containing the video data
+                pd.DataFrame: Frame containing the video data
             """
-            video_url = row['Site URL']
-            title = row['TITLE']
-            video_id = row['ID'] if 'ID' in row else None
             # For accounts with many videos we need to slow down the requests
             if video_count > 40:
                 time.sleep(random.randint(4, 7))
-            res = self.client.call(consts.SINGLE_VIDEO_HISTORY_TEMPLATE.substitute(video_id = video_id, token = token), timeout = 10).text
-            res = json.loads(res)
+            res = self._mainhub_call(consts.SINGLE_VIDEO_HISTORY_TEMPLATE.substitute(video_id = video_id, token = token), timeout = 10).content
+            res = JSON_DECODER.decode(res)
             
-            video_data_list = []
+            frames = []
 
-            for data_type in ('views', 'sales'):
+            for data_type, kind in (('views', 'view'), ('sales', 'earnings')):
                 if data_type in res['data']:
-                    for item in res['data'][data_type]:
-                        video_data = {
-                            'timestamp': item['x'],
-                            data_type: item['y'],
-                            'site': item['site'],
-                            'title': title,
-                            'url': video_url,
-                            'type': 'view' if data_type == 'views' else 'earnings'
-                        }
-                        video_data_list.append(video_data)
+                    frame = pd.json_normalize(res['data'][data_type])
+                    frame = frame.rename(columns = {'x': 'timestamp', 'y': data_type})
+                    frames.append(frame.assign(title = title, url = video_url, type = kind))
             
-                        
-            return video_data_list
+            return pd.concat(frames, ignore_index = True) if frames else pd.DataFrame()
         
         # Get the stats CSV file and prepare the filtered_ids DataFrame
         stats = self.get_stats_csv()
         filtered_ids = stats[stats['PORNHUB'] == 1][['ID', 'TITLE', 'Site URL']]
-        # Get the mainhub page token
-        page = self.client.call(consts.PORNHUB_GOTO_MAINHUB).text
-        token = consts.re.token_mainhub(page)
+        token = self._mainhub_token
         
         # Collect the video data using threads
-        video_data_list = []
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            future_to_row = {executor.submit(fetch_video_data, row, len(filtered_ids)): row for _, row in filtered_ids.iterrows()}
+        frames = []
+        # Stay within the session connection pool so every worker reuses a keep-alive connection
+        with concurrent.futures.ThreadPoolExecutor(max_workers = consts.VIDEO_STATS_WORKERS) as executor:
+            # Plain tuples avoid building a Series per row
+            video_count = len(filtered_ids)
+            future_to_row = {executor.submit(fetch_video_data, *row, video_count): row
+                             for row in filtered_ids.itertuples(index = False, name = None)}
             for future in concurrent.futures.as_completed(future_to_row):
                 if not future.cancelled():
-                    video_data_list.extend(future.result())  # Extend the main list with the results to flatten it
-                
+                    frames.append(future.result())
+        
+        # Flatten every video frame at once, views rows have no sales and vice versa
+        columns = ['timestamp', 'views', 'sales', 'site', 'title', 'url', 'type']
+        video_data = pd.concat(frames, ignore_index = True) if frames else pd.DataFrame()
+        video_data = video_data.reindex(columns = columns).fillna({'views': 0, 'sales': 0.0})
+        video_data['views'] = video_data['views'].astype('int64')
+        video_data_list = video_data.to_dict('records')
         
         self.client.db_ops.save_single_video_data(video_data_list, self.client.credentials['username'])
         return video_data_list
@@ -414,22 +461,33 @@ class Model(Account):
             logger.warning("No changes detected")
     
     
-    @cached_property     
     def conversion_rate(self, year: int = None, month: int = None) -> Union[float, None]:
+        '''
+        Get the earnings per 1 million views for a payout month.
+        Known rates are cached until the model is refreshed.
+        
+        Args:
+            year  (int): The payout year, defaults to the previous month's.
+            month (int): The payout month, defaults to the previous month.
+        
+        Returns:
+            float: The conversion rate, or None if there is not enough data.
+        '''
+        
         # Create default values for year and month
         if year is None or month is None:
-            current_date = datetime.now()
-            first_day_of_current_month = current_date.replace(day=1)
-            last_day_of_previous_month = first_day_of_current_month - timedelta(days=1)
-            year = last_day_of_previous_month.year
-            month = last_day_of_previous_month.month
-            
-        conversion_rate = self.client.db_ops.get_conversion_rate_for_payout(year=year, month=month, username=self.client.credentials['username'])
+            year, month = utils.previous_month()
+        
+        username = self.client.credentials['username']
+        rates = self.__dict__.setdefault('_conversion_rates', {})
+        
+        if (key := (year, month, username)) in rates:
+            return rates[key]
+        
+        conversion_rate = self.client.db_ops.get_conversion_rate_for_payout(year=year, month=month, username=username)
         if conversion_rate is not None:
             logger.success(f"Conversion rate for {year}-{month} is: {conversion_rate} $")
+            rates[key] = conversion_rate
             return conversion_rate
         else:
             logger.error("Not enough data to calculate earnings per 1 million views.")
-        
-
-# EOF
\ No newline at end of file
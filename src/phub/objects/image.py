@@ -1,9 +1,20 @@
 from __future__ import annotations
 
 import os
+import time
+import shutil
+from contextlib import suppress
+from pathlib import Path
+from urllib.parse import urlparse
+from email.utils import formatdate, parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import TYPE_CHECKING, Literal
 
+import requests
+import urllib3
+
 from .. import utils
+from .. import consts
 
 if TYPE_CHECKING:
     from ..core import Client
@@ -20,7 +31,7 @@ class Image:
     def __init__(self,
                  client: Client,
                  url: str,
-                 servers: list[dict] = [],
+                 servers: list[dict] = None,
                  name: str = 'image') -> None:
         '''
         Initialise a new image object.
@@ -35,14 +46,16 @@ class Image:
         self.url = url
         self.name = name
         self.client = client
-        self._servers = servers
+        self._servers = list(servers or ()) # Own copy, never shared
         
-        logger.debug(f'Generated new image object: {self}')
+        logger.debug('Generated new image object: {}', self)
         
-        # Check server image sizes
-        sizes = [s.get('size') for s in servers]
+        # Check server image sizes, stopping at the first mismatch
+        sizes = (server.get('size') for server in self._servers)
+        first = next(sizes, None)
         
-        if len(set(sizes)) > 1:
+        if any(size != first for size in sizes):
+            sizes = [server.get('size') for server in self._servers]
             logger.warning(f'Detected different image sizes on alt servers: {sizes}')
     
     def __repr__(self) -> str:
@@ -62,31 +75,173 @@ class Image:
         TODO - Handle multiple qualities/sizes
         '''
         
-        url = self.url
-        _, ext = os.path.splitext(url)
+        # Ignore the query string when guessing the extension
+        ext = Path(urlparse(self.url).path).suffix
+        
+        if (path := Path(path)).is_dir():
+            path /= self.name + ext
+        
+        path = str(path)
         
-        if os.path.isdir(path):
-            path = utils.concat(path, self.name + ext)
+        logger.info('Saving {} at {}', self, path)
         
-        logger.info(f'Saving {self} at {path}')
+        # Try the main URL, then each alt server
+        urls = [self.url] + [server['src'] for server in self._servers]
         
-        with open(path, 'wb') as file:
+        for attempt, url in enumerate(urls):
             
             try:
-                raw = self.client.call(url).content
-                file.write(raw)
+                # Let the server tell if a previous download is still current.
+                # Write the body as it arrives instead of buffering it
+                headers = self._validators(path, url)
+                response = self.client.call(url, headers = headers, stream = True)
+                
+                if headers and response.status_code == 304:
+                    response.close()
+                    logger.info('{} is already up to date at {}', self, path)
+                    return path
+                
+                # Write to a side file so the target only ever holds a
+                # complete image, and is never trusted when partial
+                part = path + '.part'
+                
+                with response:
+                    try:
+                        with open(part, 'wb') as file:
+                            response.raw.decode_content = True
+                            shutil.copyfileobj(response.raw, file, consts.DOWNLOAD_CHUNK_SIZE)
+                        
+                        # The previous source no longer describes the file
+                        with suppress(FileNotFoundError):
+                            os.remove(path + '.src')
+                        
+                        os.replace(part, path)
+                    
+                    finally:
+                        with suppress(FileNotFoundError):
+                            os.remove(part)
+                
+                # Date the file like the server copy and remember
+                # where it came from for the next check
+                if modified := response.headers.get('Last-Modified'):
+                    timestamp = parsedate_to_datetime(modified).timestamp()
+                    os.utime(path, (timestamp, timestamp))
+                
+                with open(path + '.src', 'w', encoding = 'utf-8') as file:
+                    file.write(f"{url}\n{response.headers.get('ETag', '')}\n")
+                
                 return path
                 
-            except Exception as err:
+            except (ConnectionError, requests.RequestException, urllib3.exceptions.HTTPError) as err:
+                
+                # Client errors will not be fixed by another server
+                if (isinstance(err, requests.HTTPError)
+                    and err.response is not None
+                    and err.response.status_code not in consts.RETRY_STATUSES):
+                    raise
+                
+                logger.warning(f'Failed to get image `{url}`: {err!r}')
+                
+                # Skip dead alt servers before downloading from one. The
+                # loop reads the list live, so it picks up the new order
+                if attempt == 0 and len(urls) > 2:
+                    urls[1:] = self._probe(urls[1:])
                 
-                logger.warning(f'Failed to get image `{url}`')
-                if not self._servers: raise err
+                if attempt == len(urls) - 1: raise
                 
-                # Pop server and retry
-                server = self._servers.pop(0)
-                logger.info(f'Retrying download with server {server}')
-                self.url = server['src']
-                self.download(path)
+                # Give the next server some time before retrying,
+                # or as long as a rate limit asks for
+                retry_after = getattr(err, 'retry_after', None) or getattr(err.__cause__, 'retry_after', None)
+                delay = utils.backoff(attempt, retry_after)
+                logger.info(f'Retrying download with server {urls[attempt + 1]} in {delay:.2f}s')
+                time.sleep(delay)
+
+    @staticmethod
+    def _validators(path: str, url: str) -> dict | None:
+        '''
+        Build the conditional request headers for a previous download,
+        if the file at path is complete and was downloaded from url.
+        
+        Args:
+            path (str): The image path.
+            url  (str): The URL about to be downloaded.
+        
+        Returns:
+            dict: The validator headers, or None to download unconditionally.
+        '''
+        
+        try:
+            if not os.path.getsize(path):
+                return
+            
+            with open(path + '.src', encoding = 'utf-8') as file:
+                source, etag = (file.read().splitlines() + ['', ''])[:2]
+        
+        except OSError:
+            return
+        
+        if source != url:
+            return
+        
+        headers = {'If-Modified-Since': formatdate(os.path.getmtime(path), usegmt = True)}
+        if etag:
+            headers['If-None-Match'] = etag
+        
+        return headers
+
+    def _probe(self, urls: list[str]) -> list[str]:
+        '''
+        Send HEAD requests to alt servers in parallel and
+        sort the responsive ones by response time.
+        
+        Args:
+            urls (list[str]): The alt servers image URLs.
+        
+        Returns:
+            list[str]: The responsive URLs, or all of them if none responded.
+        '''
+        
+        def head(url: str) -> str | None:
+            try:
+                response = self.client.session.head(url,
+                                                    timeout = consts.PROBE_TIMEOUT,
+                                                    proxies = self.client.proxies,
+                                                    allow_redirects = True)
+                return url if response.ok else None
+            
+            except requests.RequestException:
+                return None
+        
+        # Probes reuse the session connection pools
+        with ThreadPoolExecutor(max_workers = len(urls)) as executor:
+            futures = [executor.submit(head, url) for url in urls]
+            alive = [url for future in as_completed(futures) if (url := future.result())]
+        
+        logger.debug('Responsive alt servers: {}', alive)
+        return alive or urls
+
+    @staticmethod
+    def download_many(images: list[Image],
+                      path: os.PathLike = '.',
+                      max_workers: int = 8) -> list[str]:
+        '''
+        Download multiple images concurrently.
+        
+        Args:
+            images (list[Image]): The images to download.
+            path           (str): The download directory or path.
+            max_workers    (int): Maximum concurrent downloads.
+        
+        Returns:
+            list[str]: The image paths, in the same order as the images.
+        '''
+        
+        if not images:
+            return []
+        
+        # Workers share the client session connection pools
+        with ThreadPoolExecutor(max_workers = min(max_workers, len(images))) as executor:
+            return list(executor.map(lambda image: image.download(path), images))
 
     def dictify(self,
                 keys: Literal['all'] | list[str] = 'all',
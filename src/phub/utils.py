@@ -4,7 +4,9 @@ PHUB utilities.
 
 import math
 import json
+import random
 import requests
+from datetime import date
 from typing import Generator, Iterable, Iterator
 
 from . import consts, locals, errors
@@ -47,6 +49,37 @@ def concat(*args) -> str:
     return string
 
 
+def backoff(attempt: int, retry_after: str = None) -> float:
+    '''
+    Compute the delay before retrying a failed call, using
+    capped exponential backoff with full jitter.
+    
+    Args:
+        attempt     (int): The failed attempt index, starting at 0.
+        retry_after (str): Optional server Retry-After header value.
+    
+    Returns:
+        float: The time to wait, in seconds.
+    '''
+    
+    # Prefer the server hint when it is given in seconds
+    if retry_after and retry_after.strip().isdigit():
+        return min(float(retry_after), consts.MAX_CALL_BACKOFF)
+    
+    cap = min(consts.MAX_CALL_TIMEOUT * 2 ** attempt, consts.MAX_CALL_BACKOFF)
+    return random.uniform(0, cap)
+
+def previous_month() -> tuple[int, int]:
+    '''
+    Get the year and month before the current one.
+    
+    Returns:
+        tuple: The (year, month) pair.
+    '''
+    
+    today = date.today()
+    return (today.year, today.month - 1) if today.month > 1 else (today.year - 1, 12)
+
 def urlify(dict_: dict) -> str:
     '''
     Convert a dictionary to string arguments.